@@ -1,662 +1,919 @@
-# Copyright © 2024 Rinvo, All rights reserved.
-
-import bpy
-import webbrowser
-import bmesh
-from bpy.app.handlers import persistent
-
-bl_info = {
-    "name": "Rinvo's Blendshape Transfer",
-    "blender": (4, 0, 0),
-    "category": "3D View",
-    "version": (0, 5, 1),
-    "location": "3D View > Sidebar",
-    "warning": "Plugin is still under development",  # Optional warning text
-    "doc_url": "https://github.com/neongm/RinvosBlendshapeTransfer",
-    "tracker_url": "",
-    "author": "Rinvo",
-    "description": "Transfer blendshapes (shape keys) from one object to another using Surface Deform.\n\n"
-}
-
-# Utility Functions
-def update_blendshape_list(scene, context):
-    """Update the blendshape list based on the selected source object."""
-    # Save the current state of the blendshape items
-    saved_data = {
-        item.name: {
-            "select": item.select,
-            "target_key_name": item.target_key_name,
-            "source_key_name": item.source_key_name,
-            "sync_value": item.sync_value,
-        }
-        for item in scene.bs_shape_keys
-    }
-    
-    # Clear the list and repopulate it
-    scene.bs_shape_keys.clear()
-    source = scene.bs_source
-    if source and source.data.shape_keys:
-        for key in source.data.shape_keys.key_blocks:
-            item = scene.bs_shape_keys.add()
-            item.name = key.name
-            # Restore the saved state if it exists
-            if key.name in saved_data:
-                item.select = saved_data[key.name]["select"]
-                if(key.name in scene.bs_target.data.shape_keys.key_blocks):
-                    item.target_key_name = saved_data[key.name]["target_key_name"]
-                    item.source_key_name = saved_data[key.name]["source_key_name"]
-                    item.sync_value = saved_data[key.name]["sync_value"]
-            else:
-                item.select = False  # Default to not selected if no saved state
-
-def load_target(scene, context):
-    """Load saved data from the target object when it changes."""
-    target = scene.bs_target
-
-    # If the target is None, clear the list and return
-    if not target:
-        scene.bs_shape_keys.clear()
-        source = scene.bs_source
-        if source and source.data.shape_keys:
-            for key in source.data.shape_keys.key_blocks:
-                item = scene.bs_shape_keys.add()
-                item.name = key.name
-        return
-
-    # If the target is new (no saved data), clear the list and show default values
-    if "bs_saved_data" not in target:
-        scene.bs_shape_keys.clear()
-        update_blendshape_list(scene, context)  # Populate the list with default values
-        return
-
-    # If the target has saved data, load it
-    saved_data = target["bs_saved_data"]
-
-    # Clear the list and repopulate it based on the source object
-    scene.bs_shape_keys.clear()
-    source = scene.bs_source
-    target = scene.bs_target
-
-    if source and source.data.shape_keys:
-        for key in source.data.shape_keys.key_blocks:
-            item = scene.bs_shape_keys.add()
-            item.name = key.name
-
-            # Restore the saved state if it exists
-            if key.name in saved_data and key.name in target.data.shape_keys.key_blocks:
-                item.select = saved_data[key.name]["select"]
-                item.target_key_name = saved_data[key.name]["target_key_name"]
-                item.source_key_name = saved_data[key.name]["source_key_name"]
-                item.sync_value = saved_data[key.name]["sync_value"]
-            else:
-                # Reset properties for blendshapes that don't exist on the target
-                item.select = False
-                item.target_key_name = ""
-                item.source_key_name = ""
-                item.sync_value = key.value  # Set sync_value to the source object's shape key value
-
-    # Reset blendshapes that are gone from the target
-    for item in scene.bs_shape_keys:
-        if item.name not in saved_data:
-            # Reset properties for blendshapes that are gone from the target
-            item.select = False
-            item.target_key_name = ""
-            item.source_key_name = ""
-            item.sync_value = key.value  # Set sync_value to the source object's shape key value
-
-def save_target(scene, context):
-    """Save the current state of the blendshape list to the target object."""
-    if scene.bs_target:
-        current_data = {
-            item.name: {
-                "select": item.select,
-                "target_key_name": item.target_key_name,
-                "source_key_name": item.source_key_name,
-                "sync_value": item.sync_value,
-            }
-            for item in scene.bs_shape_keys
-        }
-        scene.bs_target["bs_saved_data"] = current_data
-
-# Update the target property to call load_target when the target changes
-def update_target(scene, context):
-    """Update the target object and load saved data if available."""
-    load_target(scene, context)
-
-def save_and_reset_shape_key_states(source):
-    """Save the current values of all shape keys on the source object and reset them."""
-    states = {}
-    if source and source.data.shape_keys:
-        for key in source.data.shape_keys.key_blocks:
-            states[key.name] = key.value
-            key.value = 0.0
-    return states
-
-def restore_shape_key_states(source, states):
-    """Restore the values of shape keys on the source object."""
-    if source and source.data.shape_keys:
-        for key in source.data.shape_keys.key_blocks:
-            if key.name in states:
-                key.value = states[key.name]
-
-def ensure_transfer_mask_vertex_group(target):
-    """Ensure the target object has a BlendshapeTransferMask vertex group."""
-    if "BlendshapeTransferMask" not in target.vertex_groups:
-        transfer_mask_group = target.vertex_groups.new(name="BlendshapeTransferMask")
-        # Initialize all vertices to weight 1.0
-        for vertex in target.data.vertices:
-            transfer_mask_group.add([vertex.index], 1.0, 'REPLACE')
-    return "BlendshapeTransferMask"
-
-def ensure_surface_deform_compatibility(obj):
-    """Simply triangulate the input object"""
-    bmo = bmesh.new()
-    bmo.from_mesh(obj.data)
-
-    bmesh.ops.triangulate(bmo, faces=bmo.faces[:])
-
-    nonmanifold = []
-    for edge in bmo.edges:
-        if not edge.is_manifold:
-            nonmanifold.append(edge)
-
-    if nonmanifold != []:
-        bmesh.ops.split_edges(bmo, edges=nonmanifold)
-
-
-    bmo.to_mesh(obj.data)
-    bmo.free()
-
-
-# Property Group for Blendshapes
-class BlendshapeItem(bpy.types.PropertyGroup):
-    # on update sync value of the target's blendshape with the source's blendshape value
-    def update_sync_value(self, context):
-        target = bpy.context.scene.bs_target
-        if(target):
-            source_key_name = self.source_key_name
-            target_key_name = self.target_key_name
-
-            
-            # Ensure the target and source shape keys exist
-            if target.data.shape_keys.key_blocks.get(target_key_name) and bpy.context.scene.bs_source.data.shape_keys.key_blocks.get(source_key_name):
-                # Sync the values of the target and source shape keys
-                target_value = self.sync_value
-                target.data.shape_keys.key_blocks[target_key_name].value = target_value
-                bpy.context.scene.bs_source.data.shape_keys.key_blocks[source_key_name].value = target_value
-                
-                target.active_shape_key_index = target.data.shape_keys.key_blocks.find(target_key_name)
-
-
-
-    name: bpy.props.StringProperty(name="Blendshape Name")
-    select: bpy.props.BoolProperty(name="Select", default=False)
-    sync_value: bpy.props.FloatProperty(name="Sync Value", default=0.0, min=0.0, max=1.0, update=update_sync_value)
-    
-    target_key_name: bpy.props.StringProperty(name="Target Key Name", default="")
-    source_key_name: bpy.props.StringProperty(name="Source Key Name", default="")
-
-
-
-
-
-# Custom Operator to Open Web Links
-class OpenWebLinkOperator(bpy.types.Operator):
-    bl_idname = "wm.open_web_link"
-    bl_label = "Open Web Link"
-    link: bpy.props.StringProperty()
-
-    def execute(self, context):
-        webbrowser.open(self.link)
-        return {'FINISHED'}
-
-# Custom UI List for Blendshapes
-class UI_UL_BlendshapeList(bpy.types.UIList):
-    def draw_item(self, context, layout, data, item, icon, active_data, active_prop):
-        row = layout.row()
-        row.label(text=item.name, icon='SHAPEKEY_DATA')
-
-        #row.prop(item, "select", text="", icon='CHECKBOX_HLT' if item.select else 'CHECKBOX_DEHLT')
-
-        # add a slider that will update the sync_value of the target object
-        if(item.target_key_name != ""):
-            #show synced icon
-            row.scale_x = 0.6
-            row.label(text="", icon='LINKED')
-            row.prop(item, "sync_value", text="", slider=True)
-        else:
-            row.scale_x = 0.6
-            row.label(text="", icon='BLANK1')
-            row.prop(context.scene.bs_source.data.shape_keys.key_blocks[item.name], "value", text="", slider=True)
-        row.scale_x = 1
-        row.prop(item, "select", text="", icon='CHECKBOX_HLT' if item.select else 'CHECKBOX_DEHLT')
-
-
-
-
-
-# Blendshape Transfer Panel
-class BlendshapeTransferPanel(bpy.types.Panel):
-    bl_label = "Blendshape Transfer"
-    bl_idname = "VIEW3D_PT_blendshape_transfer"
-    bl_space_type = 'VIEW_3D'
-    bl_region_type = 'UI'
-    bl_category = 'Blendshape'
-
-    def draw(self, context):
-        layout = self.layout
-        scene = context.scene
-
-        # Source and Target Selection
-        box = layout.box()
-        box.label(text="Source and Target Selection")
-        box.prop(scene, "bs_source", text="Source")
-        box.prop(scene, "bs_target", text="Target")
-
-        # Blendshape List
-        box = layout.box()
-        label_row = box.row()
-        label_row.label(text="Blendshape List")
-        label_row.operator("object.refresh_blendshapes", text="Refresh")
-        
-        box.template_list(
-            "UI_UL_BlendshapeList", "blendshape_list",
-            scene, "bs_shape_keys",
-            scene, "bs_shape_key_index",
-            rows=6
-        )
-
-        # Paint Transfer Mask Button
-        box = layout.box()
-        if bpy.context.active_object and bpy.context.active_object.mode == 'WEIGHT_PAINT':
-            box.operator("object.exit_paint_mode", text="Exit Paint Mode", icon='X')
-        else:
-            box.operator("object.toggle_transfer_mask_paint", text="Paint Transfer Mask", icon='BRUSH_DATA')
-
-        # Options
-        box = layout.box()
-        box.label(text="Options")
-        box.prop(scene, "bs_override_existing", text="Override Existing Shape Keys")
-        
-        if not scene.bs_override_existing:
-            box.prop(scene, "bs_key_suffix", text="Suffix")
-
-        # Advanced Options
-        advanced_box = box.box()
-        advanced_box.prop(
-            scene, "show_advanced",
-            text="Advanced Options",
-            icon='TRIA_DOWN' if scene.show_advanced else 'TRIA_RIGHT'
-        )
-        if scene.show_advanced:
-            advanced_box.prop(scene, "bs_strength", text="Strength")
-            advanced_box.prop(scene, "bs_falloff", text="Falloff")
-
-        # Experimental settings
-        experimental_box = box.box()
-        experimental_box.prop(
-            scene, "show_experimental",
-            text="Pre-Processing Modifiers",
-            icon='TRIA_DOWN' if scene.show_experimental else 'TRIA_RIGHT'
-        )
-        if scene.show_experimental:
-            experimental_box.label(text="These settings could help. Experimental.")
-
-            # Subdivision Parameters
-            subdivision_box = experimental_box.box()
-            subdivision_box.prop(scene, "bs_use_subdivision", text="Use Subdivision Modifier")
-            if scene.bs_use_subdivision:
-                subdivision_box.prop(scene, "bs_subdivision_levels", text="Subdivision Levels")
-                subdivision_box.prop(scene, "bs_subdivision_type_simple", text="Simple Subdivision")
-                subdivision_box.prop(scene, "bs_preview_subdivision", text="Preview Subdivision")
-
-            # Displacement Parameters
-            displacement_box = experimental_box.box()
-            displacement_box.prop(scene, "bs_use_displace", text="Use Displace Modifier")
-            if scene.bs_use_displace:
-                displacement_box.prop(scene, "bs_displace_strength", text="Displace Strength")
-                displacement_box.prop(scene, "bs_displace_midlevel", text="Displace Midlevel")
-                displacement_box.prop(scene, "bs_displace_direction", text="Displace Direction")
-                displacement_box.prop(scene, "bs_preview_displace", text="Preview Displace")
-
-        # Transfer Operator
-        button_box = layout.box()
-        transfer_button = button_box.operator("object.transfer_blendshapes", text="Transfer Blendshapes", icon='ARROW_LEFTRIGHT')
-
-
-# Author Links Panel
-class AuthorLinksPanel(bpy.types.Panel):
-    bl_label = "Author Links"
-    bl_idname = "VIEW3D_PT_author_links"
-    bl_space_type = 'VIEW_3D'
-    bl_region_type = 'UI'
-    bl_category = 'Blendshape'
-
-    def draw(self, context):
-        layout = self.layout
-        link_box = layout.box()
-        link_box.label(text="Author: Rinvo, hope its gonna be useful:3")
-        row = link_box.row(align=True)
-        row.operator("wm.open_web_link", text="More Links").link = "https://rinvolinks.carrd.co/"
-        row.operator("wm.open_web_link", text="Jinxxy").link = "https://jinxxy.com/rinvo/products"
-        row.operator("wm.open_web_link", text="Bluesky").link = "https://bsky.app/profile/rinvo.bsky.social"
-        row.operator("wm.open_web_link", text="Twitter").link = "https://x.com/rinvovrc"
-
-# Blendshape Transfer Operator
-class BlendshapeTransferOperator(bpy.types.Operator):
-    bl_idname = "object.transfer_blendshapes"
-    bl_label = "Transfer Blendshapes"
-    bl_options = {'REGISTER', 'UNDO'}
-
-    def execute(self, context):
-        scene = context.scene
-        target = scene.bs_target
-        
-
-        if not scene.bs_source or not target:
-            self.report({'ERROR'}, "Source or target object not set!")
-            return {'CANCELLED'}
-
-        if not scene.bs_source.data.shape_keys:
-            self.report({'ERROR'}, "Source object has no shape keys!")
-            return {'CANCELLED'}
-
-        selected_keys = [shape for shape in scene.bs_shape_keys if shape.select]
-        if not selected_keys:
-            self.report({'ERROR'}, "No blendshapes selected!")
-            return {'CANCELLED'}
-        
-        # movied down here because we need to verify before we copy the source
-        source = scene.bs_source.copy()
-        source.data = scene.bs_source.data.copy()
-        context.collection.objects.link(source)
-
-        # Ensure Object Mode
-        if bpy.context.mode != 'OBJECT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        # Save and reset shape key states
-        saved_states = save_and_reset_shape_key_states(source)
-        saved_states_target = save_and_reset_shape_key_states(target)
-
-
-        # Set all the shapekeys on source to 0
-        for key in source.data.shape_keys.key_blocks:
-            key.value = 0.0
-
-        bpy.context.view_layer.objects.active = source
-
-        # Add optional Subdivision modifier
-        if scene.bs_use_subdivision:
-            subdiv_mod = source.modifiers.new(name="Subdivision Temp", type="SUBSURF")
-            subdiv_mod.levels = scene.bs_subdivision_levels
-            subdiv_mod.render_levels = scene.bs_subdivision_levels
-            
-            if scene.bs_subdivision_type_simple:
-                subdiv_mod.subdivision_type = 'SIMPLE'
-
-        # Add optional Displace modifier and apply it temporarily
-        if scene.bs_use_displace:
-            displace_mod = source.modifiers.new(name="Displace Temp", type="DISPLACE")
-            displace_mod.strength = scene.bs_displace_strength
-            displace_mod.mid_level = scene.bs_displace_midlevel
-            displace_mod.direction = scene.bs_displace_direction
-            
-            bpy.ops.object.modifier_apply_as_shapekey(keep_modifier=True, modifier=displace_mod.name)
-            source.data.shape_keys.key_blocks[-1].name = "Displace Temp"
-            source.data.shape_keys.key_blocks[-1].value = 1.0
-        
-            source.modifiers.remove(displace_mod)
-
-        # Making sure the source Mesh is compatible with Surface Deform
-        ensure_surface_deform_compatibility(source)
-
-        # Ensure Basis shape key exists
-        if not target.data.shape_keys:
-            target.shape_key_add(name="Basis", from_mix=False)
-
-        # Ensure the transfer mask vertex group exists
-        transfer_mask_group = ensure_transfer_mask_vertex_group(target)
-
-        # Add Surface Deform modifier
-        surf_mod = target.modifiers.new(name="Surface Deform", type="SURFACE_DEFORM")
-        surf_mod.target = source
-        surf_mod.vertex_group = transfer_mask_group
-        surf_mod.strength = scene.bs_strength
-        surf_mod.falloff = scene.bs_falloff
-
-        bpy.context.view_layer.objects.active = target
-        bpy.ops.object.surfacedeform_bind(modifier=surf_mod.name)
-
-        # Transfer blendshapes
-        for shape in selected_keys:
-            key_name = shape.name
-
-            key_block = source.data.shape_keys.key_blocks.get(key_name)
-
-            if not key_block:
-                self.report({'WARNING'}, f"Blendshape '{key_name}' not found, skipping.")
-                continue
-            
-            source_key_name = f"{key_block.name}"  # Use the full name of the shape key
-            sync_value = key_block.value # save for later too
-
-            # reset on source
-            key_block.value = 1.0
-            
-            # reset on target
-
-            if key_name in target.data.shape_keys.key_blocks:
-                if scene.bs_override_existing:
-                    target.shape_key_remove(target.data.shape_keys.key_blocks[key_name])
-                else:
-                    key_name += scene.bs_key_suffix
-
-            bpy.ops.object.modifier_apply_as_shapekey(keep_modifier=True, modifier=surf_mod.name)
-            target.data.shape_keys.key_blocks[-1].name = key_name
-
-            # shape = [shape for shape in scene.bs_shape_keys if shape.name == source_key_name][0]
-
-            shape.target_key_name = key_name
-            shape.source_key_name = source_key_name
-            shape.sync_value = sync_value
-
-            key_block.value = 0.0
-
-        # Restore shape key states
-        restore_shape_key_states(source, saved_states)
-        restore_shape_key_states(target, saved_states_target)
-
-        # Remove optional Subdivision modifier
-        if scene.bs_use_subdivision:
-            source.modifiers.remove(subdiv_mod)
-
-        if scene.bs_use_displace:
-            source.shape_key_remove(source.data.shape_keys.key_blocks["Displace Temp"])
-
-        bpy.ops.object.modifier_remove(modifier=surf_mod.name)
-        self.report({'INFO'}, f"Successfully transferred {len(selected_keys)} blendshapes.")
-
-        save_target(context.scene, context)
-
-
-        # if bpy.app.version >= (4, 0, 0):
-        #     ob.select_set(False)  # Blender 4.0+
-        # else:
-        #     ob.select = False  # Blender < 4.0
-
-
-        for ob in bpy.context.selected_objects:
-            ob.select_set(False)
-
-        source.select_set(True)
-        bpy.context.view_layer.objects.active = source
-        bpy.ops.object.delete()
-
-        return {'FINISHED'}
-
-# Operator to toggle weight paint mode for the transfer mask
-class ToggleTransferMaskPaintOperator(bpy.types.Operator):
-    bl_idname = "object.toggle_transfer_mask_paint"
-    bl_label = "Toggle Transfer Mask Paint"
-    bl_options = {'REGISTER', 'UNDO'}
-
-    def execute(self, context):
-        scene = context.scene
-        target = scene.bs_target
-
-        if not target:
-            self.report({'ERROR'}, "Target object not set!")
-            return {'CANCELLED'}
-
-        # Ensure the transfer mask vertex group exists
-        transfer_mask_group = ensure_transfer_mask_vertex_group(target)
-
-        # Set the target object as active
-        bpy.context.view_layer.objects.active = target
-
-        # Toggle weight paint mode
-        if bpy.context.active_object.mode == 'WEIGHT_PAINT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-        else:
-            target.vertex_groups.active = target.vertex_groups[transfer_mask_group]
-            bpy.ops.object.mode_set(mode='WEIGHT_PAINT')
-
-        return {'FINISHED'}
-
-
-# Operator to exit paint mode
-class ExitPaintModeOperator(bpy.types.Operator):
-    bl_idname = "object.exit_paint_mode"
-    bl_label = "Exit Paint Mode"
-    bl_options = {'REGISTER', 'UNDO'}
-
-    def execute(self, context):
-        if bpy.context.active_object.mode == 'WEIGHT_PAINT':
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        return {'FINISHED'}
-
-# Operator to refresh the blendshape list
-class BlendshapeRefreshOperator(bpy.types.Operator):
-    bl_idname = "object.refresh_blendshapes"
-    bl_label = "Refresh Blendshapes"
-
-    def execute(self, context):
-        update_blendshape_list(context.scene, context)
-        return {'FINISHED'}
-
-def update_preview_modifiers(scene):
-    source = scene.bs_source
-
-    if not source:
-        return
-
-    # Remove existing preview modifiers if they exist
-    for mod in source.modifiers:
-        if mod.name.startswith("Preview_"):
-            source.modifiers.remove(mod)
-
-    # Disable preview if modifier usage is disabled
-    if scene.bs_preview_subdivision and not scene.bs_use_subdivision:
-        scene.bs_preview_subdivision = False
-    if scene.bs_preview_displace and not scene.bs_use_displace:
-        scene.bs_preview_displace = False
-
-    # Add preview modifiers if preview is enabled
-    if scene.bs_preview_subdivision:
-        subdiv_mod = source.modifiers.new(name="Preview_Subdivision", type="SUBSURF")
-        subdiv_mod.levels = scene.bs_subdivision_levels
-        subdiv_mod.render_levels = scene.bs_subdivision_levels
-        if scene.bs_subdivision_type_simple:
-            subdiv_mod.subdivision_type = 'SIMPLE'
-
-    if scene.bs_preview_displace:
-        displace_mod = source.modifiers.new(name="Preview_Displace", type="DISPLACE")
-        displace_mod.strength = scene.bs_displace_strength
-        displace_mod.mid_level = scene.bs_displace_midlevel
-        displace_mod.direction = scene.bs_displace_direction
-
-# Registration
-classes = [
-    BlendshapeItem,
-    UI_UL_BlendshapeList,
-    BlendshapeTransferPanel,
-    BlendshapeTransferOperator,
-    OpenWebLinkOperator,
-    AuthorLinksPanel,
-    BlendshapeRefreshOperator,
-    ToggleTransferMaskPaintOperator,
-    ExitPaintModeOperator,
-]
-
-def register():
-    for cls in classes:
-        bpy.utils.register_class(cls)
-    
-    bpy.types.Scene.bs_source = bpy.props.PointerProperty(type=bpy.types.Object, update=update_blendshape_list)
-    bpy.types.Scene.bs_target = bpy.props.PointerProperty(type=bpy.types.Object, update=update_target)
-    bpy.types.Scene.bs_shape_keys = bpy.props.CollectionProperty(type=BlendshapeItem)
-    bpy.types.Scene.bs_shape_key_index = bpy.props.IntProperty()
-    bpy.types.Scene.bs_override_existing = bpy.props.BoolProperty(default=True)
-    bpy.types.Scene.bs_key_suffix = bpy.props.StringProperty(default="_new")
-    bpy.types.Scene.show_advanced = bpy.props.BoolProperty(default=False)
-    bpy.types.Scene.show_experimental = bpy.props.BoolProperty(default=False)
-    bpy.types.Scene.bs_strength = bpy.props.FloatProperty(default=1.0, min=0.0, max=1.0)
-    bpy.types.Scene.bs_falloff = bpy.props.FloatProperty(default=4.0, min=0.1, max=16.0)
-
-    # Experimental properties
-    bpy.types.Scene.bs_use_subdivision = bpy.props.BoolProperty(default=False, name="Use Subdivision Modifier", update=lambda self, context: update_preview_modifiers(context.scene))
-    bpy.types.Scene.bs_subdivision_type_simple = bpy.props.BoolProperty(default=False, name="Subdivision Type Simple", update=lambda self, context: update_preview_modifiers(context.scene))
-    bpy.types.Scene.bs_subdivision_levels = bpy.props.IntProperty(default=1, min=0, max=6, name="Subdivision Levels", update=lambda self, context: update_preview_modifiers(context.scene))
-    bpy.types.Scene.bs_use_displace = bpy.props.BoolProperty(default=False, name="Use Displace Modifier", update=lambda self, context: update_preview_modifiers(context.scene))
-    bpy.types.Scene.bs_displace_strength = bpy.props.FloatProperty(default=0.01, min=0.0, name="Displace Strength", update=lambda self, context: update_preview_modifiers(context.scene))
-    bpy.types.Scene.bs_displace_midlevel = bpy.props.FloatProperty(default=0.8, min=0.0, max=1.0, name="Displace Midlevel", update=lambda self, context: update_preview_modifiers(context.scene))
-    bpy.types.Scene.bs_displace_direction = bpy.props.EnumProperty(
-        name="Displace Direction",
-        items=[
-            ('X', "X", "Displace along X-axis"),
-            ('Y', "Y", "Displace along Y-axis"),
-            ('Z', "Z", "Displace along Z-axis"),
-            ('NORMAL', "Normal", "Displace along normals")
-        ],
-        default='NORMAL'
-    )
-    bpy.types.Scene.bs_preview_subdivision = bpy.props.BoolProperty(
-        default=False,
-        name="Preview Subdivision",
-        update=lambda self, context: update_preview_modifiers(context.scene)
-    )
-    bpy.types.Scene.bs_preview_displace = bpy.props.BoolProperty(
-        default=False,
-        name="Preview Displace",
-        update=lambda self, context: update_preview_modifiers(context.scene)
-    )
-
-def unregister():
-    for cls in reversed(classes):
-        bpy.utils.unregister_class(cls)
-
-    del bpy.types.Scene.bs_source
-    del bpy.types.Scene.bs_target
-    del bpy.types.Scene.bs_shape_keys
-    del bpy.types.Scene.bs_shape_key_index
-    del bpy.types.Scene.bs_override_existing
-    del bpy.types.Scene.bs_key_suffix
-    del bpy.types.Scene.show_advanced
-    del bpy.types.Scene.show_experimental
-    del bpy.types.Scene.bs_strength
-    del bpy.types.Scene.bs_falloff
-
-    # Experimental properties
-    del bpy.types.Scene.bs_use_subdivision
-    del bpy.types.Scene.bs_subdivision_levels
-    del bpy.types.Scene.bs_use_displace
-    del bpy.types.Scene.bs_displace_strength
-    del bpy.types.Scene.bs_displace_midlevel
-    del bpy.types.Scene.bs_displace_direction
-    del bpy.types.Scene.bs_preview_subdivision
-    del bpy.types.Scene.bs_preview_displace
-
-if __name__ == "__main__":
+# Copyright © 2024 Rinvo, All rights reserved.
+
+import bpy
+import bmesh
+import numpy as np
+from bpy.app.handlers import persistent
+
+bl_info = {
+    "name": "Rinvo's Blendshape Transfer",
+    "blender": (4, 0, 0),
+    "category": "3D View",
+    "version": (0, 5, 1),
+    "location": "3D View > Sidebar",
+    "warning": "Plugin is still under development",  # Optional warning text
+    "doc_url": "https://github.com/neongm/RinvosBlendshapeTransfer",
+    "tracker_url": "",
+    "author": "Rinvo",
+    "description": "Transfer blendshapes (shape keys) from one object to another using Surface Deform.\n\n"
+}
+
+# Utility Functions
+def update_blendshape_list(scene, context):
+    """Update the blendshape list based on the selected source object."""
+    global _bs_source_ptr
+    source = scene.bs.source
+    _bs_source_ptr = source.as_pointer() if source else 0
+    if not source or not source.data.shape_keys:
+        scene.bs.shape_keys.clear()
+        scene["_bs_last_sig"] = ""
+        return
+
+    # Read the key blocks once and skip the rebuild entirely when nothing changed,
+    # this gets called a lot so the common case has to stay cheap. The source
+    # pointer is part of the signature so switching to a different object with
+    # identical key names still rebuilds
+    new_names = [key.name for key in source.data.shape_keys.key_blocks]
+    signature = str(hash((source.as_pointer(), tuple(new_names))))
+    if scene.get("_bs_last_sig", "") == signature:
+        return
+
+    # Only touch the entries that actually changed instead of clearing and
+    # repopulating the whole collection, existing items keep their state for free
+    old_names = [item.name for item in scene.bs.shape_keys]
+    gone = set(old_names) - set(new_names)
+    for index in reversed(range(len(old_names))):
+        if old_names[index] in gone:
+            scene.bs.shape_keys.remove(index)
+
+    existing = {item.name for item in scene.bs.shape_keys}
+    for name in new_names:
+        if name not in existing:
+            item = scene.bs.shape_keys.add()
+            item.name = name
+            item.select = False  # Default to not selected for new entries
+
+    # Bring the surviving items into source order, without this a key added
+    # or renamed mid-list would drift to the end of the UI list
+    current_names = [item.name for item in scene.bs.shape_keys]
+    for wanted_index, name in enumerate(new_names):
+        current_index = current_names.index(name, wanted_index)
+        if current_index != wanted_index:
+            scene.bs.shape_keys.move(current_index, wanted_index)
+            current_names.insert(wanted_index, current_names.pop(current_index))
+
+    scene["_bs_last_sig"] = signature
+
+def resize_blendshape_list(shape_keys, count):
+    """Grow or shrink the collection to the given size.
+
+    Reusing the existing items avoids the full clear() + add()-per-entry RNA
+    churn when the list is rebuilt with a similar size.
+    """
+    while len(shape_keys) < count:
+        shape_keys.add()
+    while len(shape_keys) > count:
+        shape_keys.remove(len(shape_keys) - 1)
+
+def rebuild_blendshape_list(scene, saved_data=None):
+    """Rebuild the whole list in one pass over the source key blocks.
+
+    Entries with saved state that still exists on the target are restored,
+    everything else is reset to defaults - one loop instead of the separate
+    no-target / no-saved-data / saved-data walks this used to take.
+    """
+    scene["_bs_last_sig"] = ""
+    source = scene.bs.source
+    if not source or not source.data.shape_keys:
+        scene.bs.shape_keys.clear()
+        return
+
+    target = scene.bs.target
+    # membership tests against the RNA collection are linear scans, snapshot
+    # the target key names into a set once before the loop
+    target_key_names = (frozenset(target.data.shape_keys.key_blocks.keys())
+                        if target and target.data.shape_keys else frozenset())
+    if saved_data is None:
+        saved_data = {}
+
+    key_blocks = source.data.shape_keys.key_blocks
+    resize_blendshape_list(scene.bs.shape_keys, len(key_blocks))
+    for item, key in zip(scene.bs.shape_keys, key_blocks):
+        item.name = key.name
+
+        # Restore the saved state if it exists
+        saved = saved_data.get(key.name)
+        if saved and key.name in target_key_names:
+            item.select = saved["select"]
+            item.target_key_name = saved["target_key_name"]
+            item.source_key_name = saved["source_key_name"]
+            item.sync_value = saved["sync_value"]
+        else:
+            # Reset properties for blendshapes that don't exist on the target
+            item.select = False
+            item.target_key_name = ""
+            item.source_key_name = ""
+            item.sync_value = key.value  # Set sync_value to the source object's shape key value
+
+# Separator for the flat saved-data blob, can't appear in shape key names
+_SAVED_DATA_SEP = "\x1f"
+
+def load_saved_data(target):
+    """Return the per-key saved state stored on the target, or None.
+
+    Understands both the flat joined-string format written by save_target and
+    the legacy one-IDProperty-group-per-key layout from older versions.
+    """
+    if not target:
+        return None
+    data = target.get("bs_saved_data")
+    if data is None:
+        return None
+
+    if not isinstance(data.get("names"), str):
+        # legacy nested dict, already keyed by name
+        return data
+
+    names = data["names"].split(_SAVED_DATA_SEP) if data["names"] else []
+    targets = data["targets"].split(_SAVED_DATA_SEP) if data["targets"] else []
+    sources = data["sources"].split(_SAVED_DATA_SEP) if data["sources"] else []
+    return {
+        name: {
+            "select": bool(selected),
+            "target_key_name": target_name,
+            "source_key_name": source_name,
+            "sync_value": float(value),
+        }
+        for name, target_name, source_name, value, selected
+        in zip(names, targets, sources, data["sync"], data["select"])
+    }
+
+def load_target(scene, context):
+    """Load saved data from the target object when it changes."""
+    rebuild_blendshape_list(scene, load_saved_data(scene.bs.target))
+
+def save_target(scene, context):
+    """Save the current state of the blendshape list to the target object."""
+    if not scene.bs.target:
+        return
+
+    # Bulk-read the numeric state, string props have no foreach accessor so
+    # the names come out of the single zip pass below
+    items = scene.bs.shape_keys
+    count = len(items)
+    select = np.empty(count, dtype=bool)
+    items.foreach_get("select", select)
+    sync = np.empty(count, dtype=np.float32)
+    items.foreach_get("sync_value", sync)
+
+    # Five flat entries regardless of key count - the old per-key nested dict
+    # serialized into 4x that many IDProperty nodes in the .blend
+    scene.bs.target["bs_saved_data"] = {
+        "names": _SAVED_DATA_SEP.join(item.name for item in items),
+        "targets": _SAVED_DATA_SEP.join(item.target_key_name for item in items),
+        "sources": _SAVED_DATA_SEP.join(item.source_key_name for item in items),
+        "sync": sync.tolist(),
+        "select": [int(selected) for selected in select],
+    }
+
+# Update the target property to call load_target when the target changes
+def update_target(scene, context):
+    """Update the target object and load saved data if available."""
+    load_target(scene, context)
+
+# Depsgraph handler bookkeeping: the handler only marks the list dirty, the
+# actual rebuild happens at most a few times per second from a timer (or from
+# the panel draw) so bursts of depsgraph updates don't flood the UI
+_bs_list_dirty = False
+
+# Cached pointer of the current source object (kept up to date by
+# update_blendshape_list). Comparing integers in the handler avoids
+# reconstructing a Python wrapper and an RNA equality check per update
+_bs_source_ptr = 0
+
+@persistent
+def blendshape_update_handler(scene, depsgraph):
+    global _bs_list_dirty
+    if not _bs_source_ptr or _bs_list_dirty:
+        return
+    if _bs_in_preview_update:
+        # This update came from our own preview-modifier rebuild, reacting to
+        # it would just schedule a pointless list refresh
+        return
+    for update in depsgraph.updates:
+        if update.id.original.as_pointer() == _bs_source_ptr:
+            # Moving the source around also fires updates, only geometry
+            # changes can affect the shape key list
+            if update.is_updated_geometry:
+                _bs_list_dirty = True
+            break
+
+def flush_blendshape_list():
+    """Rebuild the blendshape list if the depsgraph handler marked it dirty."""
+    global _bs_list_dirty
+    if _bs_list_dirty:
+        _bs_list_dirty = False
+        update_blendshape_list(bpy.context.scene, bpy.context)
+    return 0.25
+
+def save_and_reset_shape_key_states(source):
+    """Save the current values of all shape keys on the source object and reset them."""
+    if not source or not source.data.shape_keys:
+        return None
+    key_blocks = source.data.shape_keys.key_blocks
+    names = [key.name for key in key_blocks]
+    values = np.empty(len(key_blocks), dtype=np.float32)
+    key_blocks.foreach_get("value", values)
+    key_blocks.foreach_set("value", np.zeros(len(key_blocks), dtype=np.float32))
+    source.data.update_tag()  # foreach_set doesn't tag the depsgraph on its own
+    return names, values
+
+def restore_shape_key_states(source, states):
+    """Restore the values of shape keys on the source object."""
+    if not states or not source or not source.data.shape_keys:
+        return
+    names, values = states
+    key_blocks = source.data.shape_keys.key_blocks
+    if [key.name for key in key_blocks] == names:
+        key_blocks.foreach_set("value", values)
+        source.data.update_tag()
+    else:
+        # The key set changed since the save (e.g. a temp key was added),
+        # fall back to restoring by name
+        for name, value in zip(names, values):
+            key = key_blocks.get(name)
+            if key:
+                key.value = float(value)
+
+def ensure_mode(obj, mode):
+    """Switch the object into the given mode only if it isn't already there.
+
+    mode_set pays a full context push and depsgraph update even when the mode
+    is already correct, so skip it entirely in that case.
+    """
+    if obj and obj.mode != mode:
+        bpy.ops.object.mode_set(mode=mode)
+
+def ensure_transfer_mask_vertex_group(target):
+    """Ensure the target object has a BlendshapeTransferMask vertex group."""
+    # Fast path: index cached from a previous call, verified by name so it
+    # survives groups being removed or reordered. Rigged targets often carry
+    # dozens of groups and the name scan is linear
+    group_index = target.get("_bs_mask_vg_idx", -1)
+    if 0 <= group_index < len(target.vertex_groups) and \
+            target.vertex_groups[group_index].name == "BlendshapeTransferMask":
+        return "BlendshapeTransferMask"
+
+    transfer_mask_group = target.vertex_groups.get("BlendshapeTransferMask")
+    if transfer_mask_group is None:
+        transfer_mask_group = target.vertex_groups.new(name="BlendshapeTransferMask")
+        # Initialize all vertices to weight 1.0 in one bulk call, adding them
+        # one at a time gets painfully slow on dense meshes
+        transfer_mask_group.add(range(len(target.data.vertices)), 1.0, 'REPLACE')
+    target["_bs_mask_vg_idx"] = transfer_mask_group.index
+    return "BlendshapeTransferMask"
+
+def ensure_surface_deform_compatibility(obj):
+    """Simply triangulate the input object"""
+    bmo = bmesh.new()
+    bmo.from_mesh(obj.data)
+
+    # Only hand the non-triangle faces to the op, bmesh.ops cost grows with
+    # the input list and on mostly-triangulated meshes this is near empty
+    quads_and_ngons = [face for face in bmo.faces if len(face.verts) > 3]
+    if quads_and_ngons:
+        bmesh.ops.triangulate(bmo, faces=quads_and_ngons)
+
+    # np.fromiter keeps the is_manifold flags in a compact bool array instead
+    # of growing a Python list of edge wrappers for the (usually clean) mesh
+    manifold = np.fromiter((edge.is_manifold for edge in bmo.edges),
+                           dtype=np.bool_, count=len(bmo.edges))
+
+    if not manifold.all():
+        bmo.edges.ensure_lookup_table()
+        nonmanifold = [bmo.edges[index] for index in np.flatnonzero(~manifold)]
+        bmesh.ops.split_edges(bmo, edges=nonmanifold)
+
+
+    bmo.to_mesh(obj.data)
+    bmo.free()
+
+def add_displace_shape_key(obj, strength, mid_level, direction):
+    """Add a "Displace Temp" shape key replicating a textureless Displace modifier.
+
+    Without a texture the modifier offsets every vertex by
+    (1.0 - mid_level) * strength along the chosen direction, so the whole
+    thing is one vectorized pass instead of adding a modifier, running the
+    apply-as-shapekey operator and removing the modifier again.
+    """
+    mesh = obj.data
+    count = len(mesh.vertices)
+    coords = np.empty(count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coords)
+
+    if direction == 'NORMAL':
+        offsets = np.empty(count * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("normal", offsets)
+    else:
+        offsets = np.zeros(count * 3, dtype=np.float32)
+        offsets[{'X': 0, 'Y': 1, 'Z': 2}[direction]::3] = 1.0
+
+    coords += (1.0 - mid_level) * strength * offsets
+
+    key = obj.shape_key_add(name="Displace Temp", from_mix=False)
+    key.data.foreach_set("co", coords)
+    key.value = 1.0
+    return key
+
+
+# Property Group for Blendshapes
+class BlendshapeItem(bpy.types.PropertyGroup):
+    # on update sync value of the target's blendshape with the source's blendshape value
+    def update_sync_value(self, context):
+        scene = context.scene
+        target = scene.bs.target
+        source = scene.bs.source
+        if not target or not target.data.shape_keys or not source or not source.data.shape_keys:
+            return
+
+        # Hoist the key_blocks collections and fetch each key once, this fires
+        # on every slider tick so redundant RNA lookups add up fast
+        target_key_blocks = target.data.shape_keys.key_blocks
+        source_key_blocks = source.data.shape_keys.key_blocks
+        target_key = target_key_blocks.get(self.target_key_name)
+        source_key = source_key_blocks.get(self.source_key_name)
+
+        # Ensure the target and source shape keys exist
+        if target_key and source_key:
+            # Sync the values of the target and source shape keys
+            target_value = self.sync_value
+            target_key.value = target_value
+            source_key.value = target_value
+
+            # Reuse the cached index when it still matches so dragging the
+            # slider doesn't pay a linear find() per tick
+            index = self.target_key_index
+            if not (0 <= index < len(target_key_blocks) and target_key_blocks[index].name == self.target_key_name):
+                index = target_key_blocks.find(self.target_key_name)
+                self.target_key_index = index
+            target.active_shape_key_index = index
+
+    # note: no "name" property here, PropertyGroup already provides one and
+    # redefining it just registers (and serializes) a duplicate per item
+    select: bpy.props.BoolProperty(name="Select", default=False)
+    sync_value: bpy.props.FloatProperty(name="Sync Value", default=0.0, min=0.0, max=1.0, update=update_sync_value)
+    
+    target_key_name: bpy.props.StringProperty(name="Target Key Name", default="")
+    source_key_name: bpy.props.StringProperty(name="Source Key Name", default="")
+    # cached position of target_key_name in the target's key_blocks, verified
+    # before use in update_sync_value
+    target_key_index: bpy.props.IntProperty(name="Target Key Index", default=-1)
+
+
+# Update callbacks for the settings group, the callbacks get the group itself
+# as self so route them through the owning scene
+def _on_source_update(self, context):
+    update_blendshape_list(context.scene, context)
+
+def _on_target_update(self, context):
+    update_target(context.scene, context)
+
+def _on_preview_prop_update(self, context):
+    schedule_preview_update(context.scene)
+
+
+# All addon settings live in one PropertyGroup behind a single Scene pointer,
+# keeping the Scene RNA free of a pile of loose bs_* properties
+class BlendshapeTransferSettings(bpy.types.PropertyGroup):
+    source: bpy.props.PointerProperty(type=bpy.types.Object, update=_on_source_update)
+    target: bpy.props.PointerProperty(type=bpy.types.Object, update=_on_target_update)
+    shape_keys: bpy.props.CollectionProperty(type=BlendshapeItem)
+    shape_key_index: bpy.props.IntProperty()
+    override_existing: bpy.props.BoolProperty(default=True)
+    key_suffix: bpy.props.StringProperty(default="_new")
+    show_advanced: bpy.props.BoolProperty(default=False)
+    show_experimental: bpy.props.BoolProperty(default=False)
+    strength: bpy.props.FloatProperty(default=1.0, min=0.0, max=1.0)
+    falloff: bpy.props.FloatProperty(default=4.0, min=0.1, max=16.0)
+
+    # Experimental properties
+    use_subdivision: bpy.props.BoolProperty(default=False, name="Use Subdivision Modifier", update=_on_preview_prop_update)
+    subdivision_type_simple: bpy.props.BoolProperty(default=False, name="Subdivision Type Simple", update=_on_preview_prop_update)
+    subdivision_levels: bpy.props.IntProperty(default=1, min=0, max=6, name="Subdivision Levels", update=_on_preview_prop_update)
+    use_displace: bpy.props.BoolProperty(default=False, name="Use Displace Modifier", update=_on_preview_prop_update)
+    displace_strength: bpy.props.FloatProperty(default=0.01, min=0.0, name="Displace Strength", update=_on_preview_prop_update)
+    displace_midlevel: bpy.props.FloatProperty(default=0.8, min=0.0, max=1.0, name="Displace Midlevel", update=_on_preview_prop_update)
+    displace_direction: bpy.props.EnumProperty(
+        name="Displace Direction",
+        items=[
+            ('X', "X", "Displace along X-axis"),
+            ('Y', "Y", "Displace along Y-axis"),
+            ('Z', "Z", "Displace along Z-axis"),
+            ('NORMAL', "Normal", "Displace along normals")
+        ],
+        default='NORMAL'
+    )
+    preview_subdivision: bpy.props.BoolProperty(
+        default=False,
+        name="Preview Subdivision",
+        update=_on_preview_prop_update
+    )
+    preview_displace: bpy.props.BoolProperty(
+        default=False,
+        name="Preview Displace",
+        update=_on_preview_prop_update
+    )
+
+
+
+
+
+# Author links, drawn from a table so the panel loop stays data-driven
+_AUTHOR_LINKS = (
+    ("More Links", "https://rinvolinks.carrd.co/"),
+    ("Jinxxy", "https://jinxxy.com/rinvo/products"),
+    ("Bluesky", "https://bsky.app/profile/rinvo.bsky.social"),
+    ("Twitter", "https://x.com/rinvovrc"),
+)
+
+# Custom UI List for Blendshapes
+class UI_UL_BlendshapeList(bpy.types.UIList):
+    # source key_blocks for the current redraw, cached by filter_items so
+    # draw_item doesn't re-walk scene.bs.source.data.shape_keys per row
+    _source_key_blocks = None
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_prop):
+        row = layout.row()
+        row.label(text=item.name, icon='SHAPEKEY_DATA')
+
+        # add a slider that will update the sync_value of the target object
+        if item.target_key_name:
+            #show synced icon
+            row.scale_x = 0.6
+            row.label(text="", icon='LINKED')
+            row.prop(item, "sync_value", text="", slider=True)
+        else:
+            row.scale_x = 0.6
+            row.label(text="", icon='BLANK1')
+            source_key_blocks = self._source_key_blocks
+            if source_key_blocks is None:
+                source_key_blocks = context.scene.bs.source.data.shape_keys.key_blocks
+            row.prop(source_key_blocks[item.name], "value", text="", slider=True)
+        row.scale_x = 1
+        # plain bool prop, Blender draws the checked/unchecked state itself so
+        # there's no per-row icon branch in Python
+        row.prop(item, "select", text="")
+
+    def filter_items(self, context, data, propname):
+        """Filter by name so only the visible rows pay a draw_item call."""
+        items = getattr(data, propname)
+
+        # filter_items runs once per redraw before the draw_item calls, a good
+        # spot to refresh the per-redraw key_blocks cache
+        source = context.scene.bs.source
+        UI_UL_BlendshapeList._source_key_blocks = (
+            source.data.shape_keys.key_blocks
+            if source and source.data.shape_keys else None)
+        flt_flags = []
+        flt_neworder = []
+        if self.filter_name:
+            flt_flags = bpy.types.UI_UL_list.filter_items_by_name(
+                self.filter_name, self.bitflag_filter_item, items, "name")
+        if not flt_flags:
+            flt_flags = [self.bitflag_filter_item] * len(items)
+        return flt_flags, flt_neworder
+
+
+
+
+
+# Blendshape Transfer Panel
+class BlendshapeTransferPanel(bpy.types.Panel):
+    bl_label = "Blendshape Transfer"
+    bl_idname = "VIEW3D_PT_blendshape_transfer"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'Blendshape'
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False  # no animation dots, saves a column per row
+        scene = context.scene
+        settings = scene.bs
+
+        # Catch up on pending list changes before drawing the template_list
+        flush_blendshape_list()
+
+        # Source and Target Selection
+        box = layout.box()
+        box.label(text="Source and Target Selection")
+        box.prop(settings, "source", text="Source")
+        box.prop(settings, "target", text="Target")
+
+        # Blendshape List
+        box = layout.box()
+        label_row = box.row()
+        label_row.label(text="Blendshape List")
+        label_row.operator("object.refresh_blendshapes", text="Refresh")
+        
+        box.template_list(
+            "UI_UL_BlendshapeList", "blendshape_list",
+            settings, "shape_keys",
+            settings, "shape_key_index",
+            rows=6
+        )
+
+        # Paint Transfer Mask Button
+        box = layout.box()
+        active_object = context.active_object  # context is already resolved, bpy.context isn't
+        if active_object and active_object.mode == 'WEIGHT_PAINT':
+            box.operator("object.exit_paint_mode", text="Exit Paint Mode", icon='X')
+        else:
+            box.operator("object.toggle_transfer_mask_paint", text="Paint Transfer Mask", icon='BRUSH_DATA')
+
+        # Options
+        box = layout.box()
+        box.label(text="Options")
+        box.prop(settings, "override_existing", text="Override Existing Shape Keys")
+        
+        if not scene.bs.override_existing:
+            box.prop(settings, "key_suffix", text="Suffix")
+
+        # Advanced Options
+        advanced_box = box.box()
+        advanced_box.prop(
+            settings, "show_advanced",
+            text="Advanced Options",
+            icon='TRIA_DOWN' if settings.show_advanced else 'TRIA_RIGHT'
+        )
+        if settings.show_advanced:
+            advanced_box.prop(settings, "strength", text="Strength")
+            advanced_box.prop(settings, "falloff", text="Falloff")
+
+        # Experimental settings
+        experimental_box = box.box()
+        experimental_box.prop(
+            settings, "show_experimental",
+            text="Pre-Processing Modifiers",
+            icon='TRIA_DOWN' if settings.show_experimental else 'TRIA_RIGHT'
+        )
+        if settings.show_experimental:
+            experimental_box.label(text="These settings could help. Experimental.")
+
+            # Subdivision Parameters, plain columns instead of nested boxes so
+            # the layout solver has fewer uiLayout nodes to size per redraw
+            subdivision_col = experimental_box.column()
+            subdivision_col.prop(settings, "use_subdivision", text="Use Subdivision Modifier")
+            if settings.use_subdivision:
+                subdivision_col.prop(settings, "subdivision_levels", text="Subdivision Levels")
+                subdivision_col.prop(settings, "subdivision_type_simple", text="Simple Subdivision")
+                subdivision_col.prop(settings, "preview_subdivision", text="Preview Subdivision")
+
+            # Displacement Parameters
+            displacement_col = experimental_box.column()
+            displacement_col.prop(settings, "use_displace", text="Use Displace Modifier")
+            if settings.use_displace:
+                displacement_col.prop(settings, "displace_strength", text="Displace Strength")
+                displacement_col.prop(settings, "displace_midlevel", text="Displace Midlevel")
+                displacement_col.prop(settings, "displace_direction", text="Displace Direction")
+                displacement_col.prop(settings, "preview_displace", text="Preview Displace")
+
+        # Transfer Operator
+        button_box = layout.box()
+        transfer_button = button_box.operator("object.transfer_blendshapes", text="Transfer Blendshapes", icon='ARROW_LEFTRIGHT')
+
+
+# Author Links Panel
+class AuthorLinksPanel(bpy.types.Panel):
+    bl_label = "Author Links"
+    bl_idname = "VIEW3D_PT_author_links"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'Blendshape'
+
+    def draw(self, context):
+        layout = self.layout
+        link_box = layout.box()
+        link_box.label(text="Author: Rinvo, hope its gonna be useful:3")
+        row = link_box.row(align=True)
+        # wm.url_open is built in, no custom operator dispatch needed
+        for label, url in _AUTHOR_LINKS:
+            row.operator("wm.url_open", text=label).url = url
+
+# Blendshape Transfer Operator
+class BlendshapeTransferOperator(bpy.types.Operator):
+    bl_idname = "object.transfer_blendshapes"
+    bl_label = "Transfer Blendshapes"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        scene = context.scene
+        target = scene.bs.target
+        
+
+        if not scene.bs.source or not target:
+            self.report({'ERROR'}, "Source or target object not set!")
+            return {'CANCELLED'}
+
+        if not scene.bs.source.data.shape_keys:
+            self.report({'ERROR'}, "Source object has no shape keys!")
+            return {'CANCELLED'}
+
+        selected_keys = [shape for shape in scene.bs.shape_keys if shape.select]
+        if not selected_keys:
+            self.report({'ERROR'}, "No blendshapes selected!")
+            return {'CANCELLED'}
+        
+        # movied down here because we need to verify before we copy the source.
+        # Only the mesh datablock is duplicated - a fresh object is much
+        # lighter than object.copy(), which drags the whole modifier stack,
+        # vertex groups and constraints of the original along
+        scratch_mesh = scene.bs.source.data.copy()
+        source = bpy.data.objects.new(scene.bs.source.name + ".transfer", scratch_mesh)
+        source.matrix_world = scene.bs.source.matrix_world.copy()
+        context.collection.objects.link(source)
+
+        # Ensure Object Mode
+        ensure_mode(context.active_object, 'OBJECT')
+
+        # Save and reset shape key states
+        saved_states = save_and_reset_shape_key_states(source)
+        saved_states_target = save_and_reset_shape_key_states(target)
+
+
+        # Set all the shapekeys on source to 0
+        for key in source.data.shape_keys.key_blocks:
+            key.value = 0.0
+
+        bpy.context.view_layer.objects.active = source
+
+        # Add optional Subdivision modifier
+        if scene.bs.use_subdivision:
+            subdiv_mod = source.modifiers.new(name="Subdivision Temp", type="SUBSURF")
+            subdiv_mod.levels = scene.bs.subdivision_levels
+            subdiv_mod.render_levels = scene.bs.subdivision_levels
+            
+            if scene.bs.subdivision_type_simple:
+                subdiv_mod.subdivision_type = 'SIMPLE'
+
+        # Add the optional displacement as a temporary shape key computed
+        # directly, no modifier + apply operator round trip needed
+        if scene.bs.use_displace:
+            add_displace_shape_key(source, scene.bs.displace_strength,
+                                   scene.bs.displace_midlevel, scene.bs.displace_direction)
+
+        # Making sure the source Mesh is compatible with Surface Deform
+        ensure_surface_deform_compatibility(source)
+
+        # Ensure Basis shape key exists
+        if not target.data.shape_keys:
+            target.shape_key_add(name="Basis", from_mix=False)
+
+        # Ensure the transfer mask vertex group exists
+        transfer_mask_group = ensure_transfer_mask_vertex_group(target)
+
+        # Add Surface Deform modifier
+        surf_mod = target.modifiers.new(name="Surface Deform", type="SURFACE_DEFORM")
+        surf_mod.target = source
+        surf_mod.vertex_group = transfer_mask_group
+        surf_mod.strength = scene.bs.strength
+        surf_mod.falloff = scene.bs.falloff
+
+        bpy.context.view_layer.objects.active = target
+        bpy.ops.object.surfacedeform_bind(modifier=surf_mod.name)
+
+        # Transfer blendshapes by reading the deformed positions straight from
+        # the evaluated mesh instead of running modifier_apply_as_shapekey per
+        # key - every bpy.ops call re-evaluates the scene and pushes an undo step
+        depsgraph = context.evaluated_depsgraph_get()
+
+        # Other modifiers on the target would leak into the evaluated positions,
+        # hide them in the viewport for the duration of the bake
+        disabled_modifiers = []
+        for mod in target.modifiers:
+            if mod != surf_mod and mod.show_viewport:
+                mod.show_viewport = False
+                disabled_modifiers.append(mod)
+
+        coords = np.empty(len(target.data.vertices) * 3, dtype=np.float32)
+
+        # Snapshot the key blocks once, bpy collection lookups by string are
+        # linear scans so doing them inside the loop is O(keys * selected)
+        source_key_blocks = {key.name: key for key in source.data.shape_keys.key_blocks}
+        target_key_names = {key.name for key in target.data.shape_keys.key_blocks}
+
+        for shape in selected_keys:
+            key_name = shape.name
+
+            key_block = source_key_blocks.get(key_name)
+
+            if not key_block:
+                self.report({'WARNING'}, f"Blendshape '{key_name}' not found, skipping.")
+                continue
+
+            source_key_name = f"{key_block.name}"  # Use the full name of the shape key
+            sync_value = key_block.value # save for later too
+
+            # enable on source and grab the deformed target positions
+            key_block.value = 1.0
+            depsgraph.update()
+
+            eval_target = target.evaluated_get(depsgraph)
+            eval_mesh = eval_target.to_mesh()
+            eval_mesh.vertices.foreach_get("co", coords)
+            eval_target.to_mesh_clear()
+
+            if key_name in target_key_names:
+                if scene.bs.override_existing:
+                    target.shape_key_remove(target.data.shape_keys.key_blocks[key_name])
+                    target_key_names.discard(key_name)
+                else:
+                    key_name += scene.bs.key_suffix
+
+            new_key = target.shape_key_add(name=key_name, from_mix=False)
+            new_key.data.foreach_set("co", coords)
+            target_key_names.add(key_name)
+
+            shape.target_key_name = key_name
+            # the new key was appended at the end, prime the index cache
+            shape.target_key_index = len(target.data.shape_keys.key_blocks) - 1
+            shape.source_key_name = source_key_name
+            shape.sync_value = sync_value
+
+            key_block.value = 0.0
+
+        # Re-enable whatever we hid on the target
+        for mod in disabled_modifiers:
+            mod.show_viewport = True
+
+        # Restore shape key states
+        restore_shape_key_states(source, saved_states)
+        restore_shape_key_states(target, saved_states_target)
+
+        # Remove optional Subdivision modifier
+        if scene.bs.use_subdivision:
+            source.modifiers.remove(subdiv_mod)
+
+        if scene.bs.use_displace:
+            source.shape_key_remove(source.data.shape_keys.key_blocks["Displace Temp"])
+
+        target.modifiers.remove(surf_mod)
+        self.report({'INFO'}, f"Successfully transferred {len(selected_keys)} blendshapes.")
+
+        save_target(context.scene, context)
+
+        # Drop the scratch copy (and its mesh) directly, no selection juggling
+        # or delete operator with its undo push and depsgraph update needed
+        scratch_mesh = source.data
+        bpy.data.objects.remove(source, do_unlink=True)
+        bpy.data.meshes.remove(scratch_mesh, do_unlink=True)
+
+        return {'FINISHED'}
+
+# Operator to toggle weight paint mode for the transfer mask
+class ToggleTransferMaskPaintOperator(bpy.types.Operator):
+    bl_idname = "object.toggle_transfer_mask_paint"
+    bl_label = "Toggle Transfer Mask Paint"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        scene = context.scene
+        target = scene.bs.target
+
+        if not target:
+            self.report({'ERROR'}, "Target object not set!")
+            return {'CANCELLED'}
+
+        # Ensure the transfer mask vertex group exists
+        transfer_mask_group = ensure_transfer_mask_vertex_group(target)
+
+        # Set the target object as active
+        bpy.context.view_layer.objects.active = target
+
+        # Toggle weight paint mode
+        if target.mode == 'WEIGHT_PAINT':
+            ensure_mode(target, 'OBJECT')
+        else:
+            target.vertex_groups.active = target.vertex_groups[transfer_mask_group]
+            ensure_mode(target, 'WEIGHT_PAINT')
+
+        return {'FINISHED'}
+
+
+# Operator to exit paint mode
+class ExitPaintModeOperator(bpy.types.Operator):
+    bl_idname = "object.exit_paint_mode"
+    bl_label = "Exit Paint Mode"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        ensure_mode(context.active_object, 'OBJECT')
+        return {'FINISHED'}
+
+# Operator to refresh the blendshape list
+class BlendshapeRefreshOperator(bpy.types.Operator):
+    bl_idname = "object.refresh_blendshapes"
+    bl_label = "Refresh Blendshapes"
+
+    def execute(self, context):
+        context.scene["_bs_last_sig"] = ""  # Force a full refresh
+        update_blendshape_list(context.scene, context)
+        return {'FINISHED'}
+
+# Preview-modifier rebuilds are coalesced through a one-shot timer so that
+# scrubbing a slider (which fires the update callback on every step) only
+# rebuilds the modifier stack once instead of once per step
+_bs_preview_pending = False
+_bs_in_preview_update = False
+
+def schedule_preview_update(scene):
+    global _bs_preview_pending
+    if _bs_preview_pending:
+        return
+    _bs_preview_pending = True
+    bpy.app.timers.register(flush_preview_modifiers, first_interval=0.05)
+
+def flush_preview_modifiers():
+    global _bs_preview_pending, _bs_in_preview_update
+    _bs_preview_pending = False
+    # Guard so the depsgraph handler can tell these modifier changes came
+    # from us and doesn't schedule a list rebuild in response
+    _bs_in_preview_update = True
+    try:
+        update_preview_modifiers(bpy.context.scene)
+    finally:
+        _bs_in_preview_update = False
+    return None
+
+def update_preview_modifiers(scene):
+    source = scene.bs.source
+
+    if not source:
+        return
+
+    # Collect the names first instead of removing while iterating, and bail
+    # out early when there are no previews to add and none to clean up
+    preview_names = [mod.name for mod in source.modifiers if mod.name.startswith("Preview_")]
+    if not preview_names and not scene.bs.preview_subdivision and not scene.bs.preview_displace:
+        return
+
+    # Remove existing preview modifiers if they exist
+    for name in preview_names:
+        source.modifiers.remove(source.modifiers[name])
+
+    # Disable preview if modifier usage is disabled
+    if scene.bs.preview_subdivision and not scene.bs.use_subdivision:
+        scene.bs.preview_subdivision = False
+    if scene.bs.preview_displace and not scene.bs.use_displace:
+        scene.bs.preview_displace = False
+
+    # Add preview modifiers if preview is enabled
+    if scene.bs.preview_subdivision:
+        subdiv_mod = source.modifiers.new(name="Preview_Subdivision", type="SUBSURF")
+        subdiv_mod.levels = scene.bs.subdivision_levels
+        subdiv_mod.render_levels = scene.bs.subdivision_levels
+        if scene.bs.subdivision_type_simple:
+            subdiv_mod.subdivision_type = 'SIMPLE'
+
+    if scene.bs.preview_displace:
+        displace_mod = source.modifiers.new(name="Preview_Displace", type="DISPLACE")
+        displace_mod.strength = scene.bs.displace_strength
+        displace_mod.mid_level = scene.bs.displace_midlevel
+        displace_mod.direction = scene.bs.displace_direction
+
+# Registration
+classes = [
+    BlendshapeItem,
+    BlendshapeTransferSettings,
+    UI_UL_BlendshapeList,
+    BlendshapeTransferPanel,
+    BlendshapeTransferOperator,
+    AuthorLinksPanel,
+    BlendshapeRefreshOperator,
+    ToggleTransferMaskPaintOperator,
+    ExitPaintModeOperator,
+]
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+    bpy.app.handlers.depsgraph_update_post.append(blendshape_update_handler)
+    bpy.app.timers.register(flush_blendshape_list, first_interval=0.25, persistent=True)
+
+    bpy.types.Scene.bs = bpy.props.PointerProperty(type=BlendshapeTransferSettings)
+
+def unregister():
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
+
+    if blendshape_update_handler in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(blendshape_update_handler)
+    if bpy.app.timers.is_registered(flush_blendshape_list):
+        bpy.app.timers.unregister(flush_blendshape_list)
+
+    del bpy.types.Scene.bs
+
+if __name__ == "__main__":
     register()
\ No newline at end of file